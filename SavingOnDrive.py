@@ -1,10 +1,15 @@
 import os  # Provides functions to interact with the operating system (e.g., environment variables)
-import json  # Handles JSON encoding and decoding (used for credentials)
+import functools  # Caches the authenticated Drive client for the whole process
+import mimetypes  # Content type of in-memory uploads, from the file name
+import orjson  # Decodes the service account credentials JSON
 from google.oauth2.service_account import Credentials  # Auth module for using service account credentials
 from googleapiclient.discovery import build  # Used to construct a Google Drive API client
-from googleapiclient.http import MediaFileUpload  # Handles file uploads to Google Drive
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload  # Handle file and in-memory uploads to Google Drive
 from datetime import datetime, timedelta  # Used for time calculations and formatting (e.g., folder names)
 
+# Upload files in 8 MiB chunks so large workbooks are streamed instead of sent in one request
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
 
 class SavingOnDrive:
     def __init__(self, credentials_dict):
@@ -12,6 +17,7 @@ class SavingOnDrive:
         self.credentials_dict = credentials_dict
         self.scopes = ['https://www.googleapis.com/auth/drive']  # Full access to Google Drive
         self.service = None  # Will be initialized during authentication
+        self._folders = {}  # (folder name, parent ID) -> ID of a folder this client already created
 
     def authenticate(self):
         # Authenticate and create a Drive API service client
@@ -31,22 +37,45 @@ class SavingOnDrive:
         folder = self.service.files().create(body=file_metadata, fields='id').execute()
         return folder.get('id')
 
+    def get_folder(self, folder_name, parent_folder_id=None):
+        # Return the folder this client created under the given name and parent, creating it on first use
+        key = (folder_name, parent_folder_id)
+        if key not in self._folders:
+            self._folders[key] = self.create_folder(folder_name, parent_folder_id)
+        return self._folders[key]
+
     def upload_file(self, file_name, folder_id):
         # Upload a local file to a specific folder in Drive
         file_metadata = {'name': file_name, 'parents': [folder_id]}  # File name and destination
-        media = MediaFileUpload(file_name, resumable=True)  # Prepare file for upload
+        media = MediaFileUpload(file_name, resumable=True, chunksize=UPLOAD_CHUNK_SIZE)  # Prepare file for upload
         file = self.service.files().create(body=file_metadata, media_body=media, fields='id').execute()
         return file.get('id')  # Return uploaded file ID
 
+    def upload_buffer(self, buffer, file_name, folder_id):
+        # Upload an in-memory file (e.g. a workbook in a BytesIO) to a specific folder in Drive
+        file_metadata = {'name': file_name, 'parents': [folder_id]}
+        mimetype = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+        media = MediaIoBaseUpload(buffer, mimetype=mimetype, resumable=False)  # Small enough for a single request
+        file = self.service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+        return file.get('id')
+
     def save_files(self, files):
         # Upload multiple files to a folder named by yesterday's date
         parent_folder_id = '1tWEWGQzsJhAO-VzdAI2arYey6H1EwMjV'  # Static folder ID where subfolders are created
 
         yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')  # Format folder name as YYYY-MM-DD
-        folder_id = self.create_folder(yesterday, parent_folder_id)  # Create dated subfolder under parent
+        folder_id = self.get_folder(yesterday, parent_folder_id)  # Create dated subfolder under parent once
 
         for file_name in files:
             self.upload_file(file_name, folder_id)  # Upload each file to the created folder
 
         print(f"Files uploaded successfully to folder '{yesterday}' on Google Drive.")  # Confirmation message
 
+
+@functools.cache
+def get_drive_saver(credentials_json):
+    # Return one authenticated SavingOnDrive per process for the given credentials JSON string,
+    # so every upload of the run reuses the same Drive service and its HTTP connection
+    drive_saver = SavingOnDrive(orjson.loads(credentials_json))
+    drive_saver.authenticate()
+    return drive_saver
@@ -0,0 +1,80 @@
+# Pool of warm Playwright browsers shared by the used and certified scrapers
+import asyncio  # For the per-profile locks and idle timers
+import logging  # For reporting browsers that went away while pooled
+import os  # For the pool settings
+from contextlib import asynccontextmanager  # For the acquire helper
+from playwright.async_api import async_playwright  # Starts the Playwright driver once per pool
+from browser_utils import launch_persistent_context  # Lean Chromium on a persistent profile
+
+# Milliseconds an unused browser stays open for the next job before it is closed to free memory
+POOL_IDLE_MS = int(os.environ.get("SCRAPER_POOL_IDLE_MS", 60000))
+
+
+class BrowserPool:
+    # Keeps one browser per persistent profile open between scraper jobs, so only the first job on a
+    # profile pays Chromium's launch. A profile serves one job at a time, since Chromium locks it.
+    def __init__(self, idle_ms=POOL_IDLE_MS):
+        self.idle_ms = idle_ms
+        self._playwright = None  # Playwright driver, started with the first browser
+        self._contexts = {}  # Profile name -> its open persistent context
+        self._locks = {}  # Profile name -> lock held by the job using the profile
+        self._idle_since = {}  # Profile name -> loop time its context was last released
+
+    @asynccontextmanager
+    async def acquire(self, name):
+        # Lend the persistent context of the named profile, launching its browser if it is not open
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            self._idle_since.pop(name, None)
+            context = self._contexts.get(name)
+            if context is None:
+                context = await self._launch(name)
+            try:
+                yield context
+            finally:
+                if self._contexts.get(name) is context:
+                    loop = asyncio.get_running_loop()
+                    self._idle_since[name] = loop.time()
+                    loop.call_later(self.idle_ms / 1000, lambda: asyncio.ensure_future(self._close_idle(name)))
+
+    async def _launch(self, name):
+        # Launch the named profile's browser and register its context
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        context = await launch_persistent_context(self._playwright, name)
+        self._contexts[name] = context
+        # A crashed browser leaves the pool, so the next job launches a fresh one
+        context.on("close", lambda _: self._forget(name, context))
+        return context
+
+    def _forget(self, name, context):
+        # Drop a context that closed without the pool closing it
+        if self._contexts.get(name) is context:
+            del self._contexts[name]
+            logging.warning("Pooled browser for profile %s closed unexpectedly", name)
+
+    async def _close_idle(self, name):
+        # Close the named profile's browser if no job has used it for idle_ms
+        async with self._locks[name]:
+            idle_since = self._idle_since.get(name)
+            if idle_since is None or asyncio.get_running_loop().time() - idle_since < self.idle_ms / 1000:
+                return  # Used again since the timer was set
+            del self._idle_since[name]
+            context = self._contexts.pop(name, None)
+            if context is not None:
+                await context.close()
+
+    async def close(self):
+        # Close every pooled browser and stop the Playwright driver
+        self._idle_since.clear()
+        contexts = list(self._contexts.values())
+        self._contexts.clear()
+        for context in contexts:
+            await context.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+# Pool shared by every scraper in the process
+BROWSER_POOL = BrowserPool()
@@ -0,0 +1,281 @@
+# Shared Playwright helpers used by the Oogoo scrapers
+import asyncio  # For per-attempt deadlines and backoff sleeps
+import logging  # For reporting retried attempts
+import os  # For the persistent profile paths
+import random  # For backoff jitter
+import time  # For epoch-based rate limit resets
+from email.utils import parsedate_to_datetime  # For Retry-After given as an HTTP date
+from urllib.parse import urlparse  # For matching request hosts against the tracker denylist
+from aiolimiter import AsyncLimiter  # Token-bucket rate limiting for navigations
+import httpx  # Browserless HTTP client for server-rendered pages
+from playwright.async_api import Error as PlaywrightError  # Base class of all Playwright failures
+
+# Chromium flags for headless scraping: the scrapers only read DOM text, so GPU,
+# extensions, background services and image decoding are pure overhead
+LAUNCH_ARGS = [
+    "--disable-dev-shm-usage",  # Use /tmp instead of the small /dev/shm in containers
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--mute-audio",
+    "--no-first-run",
+    # One renderer process per site is not needed for scraping and costs memory per cross-site frame
+    "--disable-features=IsolateOrigins,site-per-process,TranslateUI,BlinkGenPropertyTrees",
+    "--blink-settings=imagesEnabled=false",
+]
+
+# Options for every scraping context: a regular desktop browser fingerprint
+CONTEXT_OPTIONS = {
+    "java_script_enabled": True,
+    "viewport": {"width": 1280, "height": 800},
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36"
+    ),
+}
+
+# Directory holding one persistent Chromium profile per scraper, so the HTTP cache and
+# cookies survive between runs (the daily workflow restores it from the Actions cache)
+PROFILE_ROOT = ".pw_profile"
+
+# Cap on each profile's disk cache, which keeps the restored directory bounded
+PROFILE_CACHE_BYTES = 100 * 1024 * 1024
+
+# Headers for plain HTTP fetches, matching the browser contexts' fingerprint
+HTTP_HEADERS = {
+    "User-Agent": CONTEXT_OPTIONS["user_agent"],
+    "Accept-Language": "ar,en;q=0.8",
+}
+
+# Request types the scrapers never read; aborting them saves bandwidth and render time.
+# "other" covers beacons, pings and CSP reports.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet", "texttrack", "websocket", "manifest", "other"}
+
+# Analytics and ad hosts whose requests are dropped
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+    "googlesyndication.com",
+    "adservice.google.com",
+    "clarity.ms",
+    "analytics.tiktok.com",
+    "sc-static.net",
+)
+
+# Requests per second allowed against oogoocar.com across the whole run
+REQUESTS_PER_SECOND = 5
+
+# Token bucket shared by every scraper in the process, since they all hit oogoocar.com
+REQUEST_LIMITER = AsyncLimiter(max_rate=REQUESTS_PER_SECOND, time_period=1)
+
+# Maximum number of requests in flight to a single host, on top of the request rate
+PER_HOST_CONCURRENCY = 8
+
+# Host name -> semaphore capping its in-flight requests, created on first use
+_host_semaphores = {}
+
+# Longest server-requested pause honored, in seconds; longer requests are clamped to it
+MAX_RATE_LIMIT_PAUSE = 120
+
+# X-RateLimit-Reset values at least this large are Unix timestamps rather than second counts
+EPOCH_RESET_THRESHOLD = 1_000_000_000
+
+# Event-loop time before which no request may start, pushed forward by Retry-After and
+# exhausted X-RateLimit-Remaining headers
+_paused_until = 0.0
+
+
+class HTTPStatusError(Exception):
+    # Raised by goto when the server answers with an HTTP error status
+    def __init__(self, url, status):
+        super().__init__(f"HTTP {status} for {url}")
+        self.url = url
+        self.status = status
+
+    @property
+    def transient(self):
+        # Timeouts, throttling and server errors may succeed on retry; other 4xx never will
+        return self.status in (408, 429) or self.status >= 500
+
+
+async def launch_browser(playwright):
+    # Launch a lean headless Chromium instance from an active Playwright driver
+    return await playwright.chromium.launch(
+        headless=True,
+        args=LAUNCH_ARGS,
+        chromium_sandbox=False,
+        handle_sigint=False,
+    )
+
+
+async def block_unneeded_requests(route):
+    # Route handler that aborts heavy resources and trackers and lets everything else through
+    request = route.request
+    host = urlparse(request.url).hostname or ""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or host.endswith(BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def new_context(browser):
+    # Create a scraping context with the shared options and the request blocker installed
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    await context.route("**/*", block_unneeded_requests)
+    return context
+
+
+async def launch_persistent_context(playwright, name):
+    # Launch lean headless Chromium on the named persistent profile and return its context,
+    # with the shared options and request blocker; closing the context closes the browser
+    context = await playwright.chromium.launch_persistent_context(
+        os.path.join(PROFILE_ROOT, name),
+        headless=True,
+        args=[*LAUNCH_ARGS, f"--disk-cache-size={PROFILE_CACHE_BYTES}"],
+        chromium_sandbox=False,
+        handle_sigint=False,
+        **CONTEXT_OPTIONS,
+    )
+    await context.route("**/*", block_unneeded_requests)
+    return context
+
+
+def set_request_rate(max_rate):
+    # Replace the shared token bucket, e.g. to give each worker process its share of the budget
+    global REQUEST_LIMITER
+    REQUEST_LIMITER = AsyncLimiter(max_rate=max_rate, time_period=1)
+
+
+def set_host_concurrency(limit):
+    # Replace the per-host cap, e.g. to give each worker process its share of PER_HOST_CONCURRENCY
+    global PER_HOST_CONCURRENCY
+    PER_HOST_CONCURRENCY = limit
+    _host_semaphores.clear()
+
+
+async def wait_for_pause():
+    # Sleep out any server-requested pause
+    delay = _paused_until - asyncio.get_running_loop().time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def wait_for_rate_limit():
+    # Sleep out any server-requested pause, then take a slot from the shared token bucket
+    await wait_for_pause()
+    await REQUEST_LIMITER.acquire()
+
+
+def rate_limit_pause(headers):
+    # Seconds the server asks every request to wait, or None. Retry-After may be a second count
+    # or an HTTP date; X-RateLimit-Reset may be a second count or a Unix timestamp.
+    retry_after = headers.get("retry-after")
+    if retry_after is not None:
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            return int(retry_after)
+        try:
+            return parsedate_to_datetime(retry_after).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError):
+            return None  # Unparseable; the retry backoff covers it
+    if headers.get("x-ratelimit-remaining") == "0":
+        try:
+            reset = float(headers.get("x-ratelimit-reset", "1"))
+        except ValueError:
+            return None
+        return reset - time.time() if reset >= EPOCH_RESET_THRESHOLD else reset
+    return None
+
+
+def honor_rate_limit_headers(headers):
+    # Pause every scraper when the server sends Retry-After or reports no remaining quota,
+    # for at most MAX_RATE_LIMIT_PAUSE seconds
+    global _paused_until
+    pause = rate_limit_pause(headers)
+    if pause is None or pause <= 0:
+        return
+    pause = min(pause, MAX_RATE_LIMIT_PAUSE)
+    resume_at = asyncio.get_running_loop().time() + pause
+    if resume_at > _paused_until:
+        _paused_until = resume_at
+        logging.warning("Server asked to slow down, pausing requests for %.0fs", pause)
+
+
+def host_semaphore(url):
+    # Semaphore capping the in-flight requests to url's host
+    host = urlparse(url).hostname or ""
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(PER_HOST_CONCURRENCY)
+    return _host_semaphores[host]
+
+
+async def goto(page, url, **kwargs):
+    # Navigate page to url once the shared rate limiter and the host's semaphore grant a slot;
+    # HTTP errors raise HTTPStatusError
+    await wait_for_rate_limit()
+    async with host_semaphore(url):
+        response = await page.goto(url, **kwargs)
+    if response is not None:
+        honor_rate_limit_headers(response.headers)
+    if response is not None and response.status >= 400:
+        raise HTTPStatusError(url, response.status)
+    return response
+
+
+def new_http_client():
+    # Create the pooled HTTP/2 client used for pages that render without JavaScript;
+    # idle connections are kept warm so later fetches skip the TCP and TLS handshakes
+    return httpx.AsyncClient(
+        http2=True,
+        headers=HTTP_HEADERS,
+        timeout=20,
+        follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128, keepalive_expiry=30),
+    )
+
+
+async def fetch_html(client, url, take_token=True):
+    # GET url through the shared rate limiter and the host's semaphore and return its HTML;
+    # HTTP errors raise HTTPStatusError. Pass take_token=False when the caller already took
+    # the token, e.g. through with_retry(..., take_token=True).
+    if take_token:
+        await wait_for_rate_limit()
+    async with host_semaphore(url):
+        response = await client.get(url)
+    honor_rate_limit_headers(response.headers)
+    if response.status_code >= 400:
+        raise HTTPStatusError(url, response.status_code)
+    return response.text
+
+
+async def with_retry(coro_fn, tries=3, base=0.5, timeout=20, take_token=False):
+    """
+    Await coro_fn() under a per-attempt deadline, retrying timeouts, Playwright and
+    httpx transport errors and transient HTTP statuses with exponential backoff plus jitter.
+    Permanent HTTP errors (e.g. 404) and the last failure are re-raised.
+    With take_token, each attempt's token of the shared rate limiter is taken before its
+    deadline starts, so queueing behind many requests never counts as a timeout; coro_fn
+    must then not take one itself.
+    """
+    for attempt in range(tries):
+        # A server-requested pause is slept before the deadline starts, so it never uses up attempts
+        if take_token:
+            await wait_for_rate_limit()
+        else:
+            await wait_for_pause()
+        try:
+            return await asyncio.wait_for(coro_fn(), timeout=timeout)
+        except (asyncio.TimeoutError, PlaywrightError, httpx.TransportError, HTTPStatusError) as e:
+            if isinstance(e, HTTPStatusError) and not e.transient:
+                raise
+            if attempt + 1 == tries:
+                raise
+            delay = base * 2 ** attempt + random.random() * 0.3
+            logging.warning("Attempt %s failed (%r), retrying in %.2fs", attempt + 1, e, delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,57 @@
+# On-disk cache of scraped car detail pages, shared by the used and certified scrapers
+import os  # For the cache directory
+import time  # For entry ages
+import orjson  # Fast encoding/decoding of the cache file
+
+# File holding the cached details; the daily workflow restores it from the Actions cache
+DETAIL_CACHE_FILE = os.path.join('.cache', 'oogoo_details.json')
+
+# Seconds a cached detail page stays valid: a little over the daily schedule, so the next day's run
+# reuses it despite scheduler jitter and the run after that scrapes it again
+DETAIL_CACHE_TTL = 26 * 60 * 60
+
+
+class DetailCache:
+    # Scraped details keyed by car URL, loaded from disk on first use and written back by save();
+    # entries older than ttl seconds are ignored and dropped on the next save
+    def __init__(self, path=DETAIL_CACHE_FILE, ttl=DETAIL_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._entries = None  # URL -> [time stored, details], read lazily by _load
+
+    def _load(self):
+        # Read the cache file once, keeping only the entries that are still fresh
+        if self._entries is None:
+            try:
+                with open(self.path, 'rb') as fp:
+                    entries = orjson.loads(fp.read())
+            except (OSError, orjson.JSONDecodeError):
+                entries = {}
+            now = time.time()
+            self._entries = {url: entry for url, entry in entries.items() if now - entry[0] < self.ttl}
+        return self._entries
+
+    def get(self, url):
+        # Cached details of url, or None when it was not scraped within the TTL
+        entry = self._load().get(url)
+        if entry is None or time.time() - entry[0] >= self.ttl:
+            return None
+        return entry[1]
+
+    def set(self, url, details):
+        # Remember the details scraped from url
+        self._load()[url] = [time.time(), details]
+
+    def save(self):
+        # Write the fresh entries back to disk; a no-op when the cache was never used
+        if self._entries is None:
+            return
+        now = time.time()
+        entries = {url: entry for url, entry in self._entries.items() if now - entry[0] < self.ttl}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as fp:
+            fp.write(orjson.dumps(entries))
+
+
+# Cache shared by every scraper in the process
+DETAIL_CACHE = DetailCache()
@@ -1,11 +1,17 @@
 import asyncio  # For running asynchronous scraping tasks
 import os  # Used to access environment variables and filesystem
-import json  # For handling credentials in JSON format
-import pandas as pd  # Used for handling data and saving Excel files
+import xlsxwriter  # For streaming the Excel files
 from datetime import datetime, timedelta  # To calculate "yesterday"
 from oogoo_used import OogooUsed  # Scraper class for used cars
 from oogoo_certified import OogooCertified  # Scraper class for certified cars
-from SavingOnDrive import SavingOnDrive  # Class for uploading files to Google Drive
+from SavingOnDrive import get_drive_saver  # Process-wide authenticated Google Drive client
+from browser_pool import BROWSER_POOL  # Browsers kept warm across the scrapers' listing pages
+from detail_cache import DETAIL_CACHE  # Details scraped by recent runs, keyed by URL
+
+try:
+    import uvloop  # libuv-based event loop, faster for this I/O-bound workload
+except ImportError:  # Not available on Windows; the default asyncio loop is used there
+    uvloop = None
 
 # Ensure that the required environment variable is set for Google Drive credentials
 if 'OGO_GCLOUD_KEY_JSON' not in os.environ:
@@ -20,6 +26,10 @@ class ScraperMain:
         self.data_used = []
         self.data_certified = []
 
+        # Car links scraped so far per category, so a car shifted onto the next page is not scraped twice
+        self.seen_used = set()
+        self.seen_certified = set()
+
         # Semaphore to limit concurrent browser sessions (max 5 at once)
         self.semaphore = asyncio.Semaphore(5)
 
@@ -28,12 +38,13 @@ class ScraperMain:
         print("Scraping used cars...")
         for page in range(1, 3):  # Loop through pages 1 and 2
             url = f"https://oogoocar.com/ar/explore/used/all/all/all/all/list/0/basic?page={page}"
-            scraper = OogooUsed(url)  # Instantiate the used car scraper
+            scraper = OogooUsed(url, seen_links=self.seen_used)  # Instantiate the used car scraper
             try:
                 # Limit concurrent access using semaphore
                 async with self.semaphore:
-                    cars = await scraper.get_car_details()
-                self.filter_data(cars, "used")  # Filter by yesterday's date
+                    # Cars are filtered as they stream in, so the others are never held for the whole page
+                    async for car in scraper.iter_car_details():
+                        self.filter_car(car, "used")  # Keep only yesterday's cars
             except Exception as e:
                 print(f"Error scraping used cars on page {page}: {e}")
 
@@ -42,23 +53,22 @@ class ScraperMain:
         print("Scraping certified cars...")
         for page in range(1, 3):  # Loop through pages 1 and 2
             url = f"https://oogoocar.com/ar/explore/featured/all/all/certified/all/list/0/basic?page={page}"
-            scraper = OogooCertified(url)  # Instantiate the certified car scraper
+            scraper = OogooCertified(url, seen_links=self.seen_certified)  # Instantiate the certified car scraper
             try:
                 async with self.semaphore:
-                    cars = await scraper.get_car_details()
-                self.filter_data(cars, "certified")
+                    async for car in scraper.iter_car_details():
+                        self.filter_car(car, "certified")
             except Exception as e:
                 print(f"Error scraping certified cars on page {page}: {e}")
 
-    def filter_data(self, cars, category):
-        # Filter scraped cars to include only those published "yesterday"
-        for car in cars:
-            date_published = car.get("date_published", "").split()[0]  # Extract just the date part
-            if date_published == self.yesterday:
-                if category == "used":
-                    self.data_used.append(car)
-                else:
-                    self.data_certified.append(car)
+    def filter_car(self, car, category):
+        # Keep a scraped car only if it was published "yesterday"
+        date_published = (car.get("date_published") or "").split(" ")[0]  # Extract just the date part
+        if date_published == self.yesterday:
+            if category == "used":
+                self.data_used.append(car)
+            else:
+                self.data_certified.append(car)
 
     def save_to_excel(self):
         # Save filtered car data into Excel files
@@ -78,13 +88,28 @@ class ScraperMain:
         return files  # Return list of saved Excel file names
 
     def create_excel(self, name, data):
-        # Create an Excel file for a given dataset
+        # Create an Excel file for a given dataset, writing it row by row
         file_name = f"{name}.xlsx"
-        df = pd.DataFrame(data)  # Convert list of dicts to DataFrame
-        with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name=name.lower(), index=False)  # Save to Excel
+        headers = list(dict.fromkeys(key for car in data for key in car))  # Union of keys, first-seen order
+
+        # constant_memory flushes each row to disk as soon as the next one starts
+        workbook = xlsxwriter.Workbook(file_name, {
+            'constant_memory': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+        })
+        worksheet = workbook.add_worksheet(name.lower())
+        worksheet.write_row(0, 0, headers)
+        for row_index, car in enumerate(data, start=1):
+            worksheet.write_row(row_index, 0, [self.excel_value(car.get(header)) for header in headers])
+        workbook.close()
+
         print(f"Saved {file_name}")
         return file_name
+
+    def excel_value(self, value):
+        # Nested fields (title, submitter, specification) are written as text, like pandas did
+        return str(value) if isinstance(value, (dict, list)) else value
     
     def upload_to_drive(self, files):
         # Upload the generated Excel files to Google Drive
@@ -98,21 +123,18 @@ class ScraperMain:
         # Debug print to show that credentials are loaded correctly
         print(f"Loaded OGO_GCLOUD_KEY_JSON: {len(credentials_json)} characters")
 
-        credentials_dict = json.loads(credentials_json)  # Parse JSON string to dictionary
-
         print(f"Excel files: {files}")
 
-        # Initialize Google Drive uploader
-        drive_saver = SavingOnDrive(credentials_dict)
-        drive_saver.authenticate()
+        # Get the authenticated Google Drive uploader (parsed and built once per process)
+        drive_saver = get_drive_saver(credentials_json)
 
         # Define the parent folder and subfolder name for organizing uploads
         folder_name = self.yesterday
         parent_folder_id = '11MyzXZ_I4Sh7hDdk9eH0sABdtVt5tUwY'  # Predefined parent folder
     
-        # Create a dated subfolder
-        folder_id = drive_saver.create_folder(folder_name, parent_folder_id)
-        print(f"Created folder '{folder_name}' with ID: {folder_id}")
+        # Create the dated subfolder (once per process, later uploads reuse it)
+        folder_id = drive_saver.get_folder(folder_name, parent_folder_id)
+        print(f"Using folder '{folder_name}' with ID: {folder_id}")
     
         # Upload each file to the folder
         for file_name in files:
@@ -123,8 +145,12 @@ class ScraperMain:
 
     async def run(self):
         # Orchestrate the entire workflow
-        await asyncio.gather(self.scrape_used(), self.scrape_certified())  # Run both scraping tasks concurrently
-        files = self.save_to_excel()  # Save filtered results to Excel
+        try:
+            await asyncio.gather(self.scrape_used(), self.scrape_certified())  # Run both scraping tasks concurrently
+        finally:
+            await BROWSER_POOL.close()  # Shut down the pooled browsers once all pages are scraped
+            DETAIL_CACHE.save()  # Let the next run skip the detail pages scraped in this one
+        files = await asyncio.to_thread(self.save_to_excel)  # Write Excel off the event loop
         print(f"Files to upload: {files}")
         if files:
             self.upload_to_drive(files)  # Upload to Google Drive if files exist
@@ -135,6 +161,8 @@ class ScraperMain:
 
 if __name__ == "__main__":
     # Entry point: create an instance and run the full workflow
+    if uvloop is not None:
+        uvloop.install()
     scraper = ScraperMain()
     asyncio.run(scraper.run())
 
@@ -1,261 +1,355 @@
 import asyncio
-from playwright.async_api import async_playwright  # Async Playwright for browser automation
-import nest_asyncio  # Allow nested event loops (important in Jupyter or nested async environments)
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError  # Raised when a wait gives up
+from browser_utils import HTTPStatusError, fetch_html, goto, new_http_client, with_retry  # Shared Chromium, navigation and retry helpers
+from contextlib import AsyncExitStack  # Holds the pooled browser while a listing is scraped
+from browser_pool import BROWSER_POOL  # Warm browsers reused across listing pages
+from detail_cache import DETAIL_CACHE  # Details scraped by recent runs, keyed by URL
 import re  # Regular expressions for parsing relative dates
 from datetime import datetime, timedelta  # Date and time manipulation
-import json  # For parsing JSON attributes from HTML
-
-# Allow nested event loops (useful when running in notebooks or nested async environments)
-nest_asyncio.apply()
+import orjson  # Fast parsing of JSON attributes from HTML
+from selectolax.parser import HTMLParser  # Fast HTML parsing of pages fetched over HTTP
+from urllib.parse import urljoin  # Resolves card hrefs against the site URL
+
+# Base for resolving the site's relative links
+SITE_URL = 'https://oogoocar.com'
+
+# CSS selectors of the listing card fields, defined once and reused for every card
+CARD_SELECTORS = {
+    'card': '.list-item-car',
+    'link': 'a',
+    'brand': '.brand-car span',
+    'price': '.price span',
+    'title': '.title-car',
+}
+
+# Reads brand, price, link and title of every listing card in a single round-trip,
+# using the selectors of CARD_SELECTORS passed in as the argument. The link is the raw href,
+# resolved in Python with urljoin like fetch_cards does, so both paths produce the same string.
+CARDS_JS = """sel => Array.from(document.querySelectorAll(sel.card), card => {
+    const text = s => card.querySelector(s)?.innerText ?? null;
+    const title = card.querySelector(sel.title);
+    return {
+        brand: text(sel.brand),
+        price: text(sel.price),
+        link: card.querySelector(sel.link)?.getAttribute('href') ?? null,
+        title: title ? {
+            model: title.querySelector('span:nth-child(1)')?.innerText ?? 'Model not found',
+            distance: title.querySelector('span:nth-child(2)')?.innerText ?? 'Distance not found',
+        } : {model: null, distance: null},
+    };
+})"""
+
+# Reads every field of a car detail page in a single round-trip; the mpt-properties
+# JSON of the .whatsapp button is returned raw and decoded in Python
+DETAILS_JS = """() => {
+    const text = el => el ? el.innerText : null;
+    const posted = document.querySelector('.car-ad-posted figcaption');
+    const specification = {};
+    for (const li of document.querySelectorAll('.specification ul li')) {
+        const key = li.querySelector('h3'), value = li.querySelector('p');
+        if (key && value) specification[key.innerText] = value.innerText;
+    }
+    return {
+        submitter: posted ? {
+            submitter: text(posted.querySelector('label')),
+            relative_date: text(posted.querySelector('p')),
+        } : null,
+        specification,
+        description: text(document.querySelector('#description-section')) ?? 'No Description Found',
+        contact_properties: document.querySelector('.detail-contact-info .whatsapp')?.getAttribute('mpt-properties') ?? null,
+        relative_date: text(document.querySelector('.car-ad-posted figcaption p')),
+    };
+}"""
+
+# Arabic relative dates matched in a single pass; (?!ين) stops "يوم" (one day) from
+# also matching the start of "يومين" (two days). Counted hours and days take the plural
+# ("ساعات", "أيام") from 3 to 10 and the singular ("ساعة", "يوم") otherwise; one and two
+# are written as the bare noun and its dual.
+RELATIVE_DATE_PATTERN = re.compile(
+    r'نُشر منذ (?:(?P<hours>\d+) (?:ساعة|ساعات)|(?P<one_hour>ساعة)|(?P<two_hours>ساعتين)'
+    r'|(?P<one_day>يوم)(?!ين)|(?P<two_days>يومين)|(?P<days>\d+) (?:أيام|يوم))'
+)
+
+# Any of these nodes means the detail page content has rendered
+DETAIL_READY_SELECTOR = '#description-section, .specification ul li, .detail-contact-info .whatsapp'
+
+# Maximum number of detail pages scraped at the same time
+MAX_CONCURRENT_DETAILS = 8
+
+# Hard cap in seconds on one detail page, HTTP retries and browser fallback included, so a stuck
+# page costs at most this long instead of holding up the listing
+DETAIL_DEADLINE = 90
+
+def _text(node):
+    # Stripped text of a selectolax node, None when the node is missing
+    return node.text(strip=True) if node is not None else None
 
 class OogooCertified:
-    def __init__(self, url, retries=3):
+    def __init__(self, url, retries=3, seen_links=None):
         # Initialize with target URL and retry count for scraping failures
         self.url = url
         self.retries = retries
+        self._sem = asyncio.Semaphore(MAX_CONCURRENT_DETAILS)  # Caps concurrent detail pages
+        self._http = None  # Pooled HTTP client for detail pages, open while get_car_details runs
+        self._stack = None  # Exit stack of the running iter_car_details, which releases the borrowed browser
+        self._context = None  # Pooled browser context, borrowed by _get_context once a page needs a tab
+        self._context_lock = asyncio.Lock()  # Lets concurrent detail pages borrow the browser only once
+        # Whether detail pages carry their fields in the raw HTML: None until the first page tells
+        self._static_details = None
+        self._now = None  # Reference time of the relative dates, taken once when the scrape starts
+        # Links already scraped, possibly shared with the scrapers of other listing pages
+        self.seen_links = seen_links if seen_links is not None else set()
 
     async def get_car_details(self):
         """
         Main method to scrape car listings from the provided URL.
-        Extracts metadata and calls detail page scraping for each car.
+        Returns every car of the listing with its details, collected from iter_car_details.
         """
-        async with async_playwright() as p:
-            # Launch Chromium in headless mode
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-
-            # Set high timeouts for slower network/pages
-            page.set_default_navigation_timeout(3000000)
-            page.set_default_timeout(3000000)
-
-            cars = []  # Store all car dictionaries
+        return [car async for car in self.iter_car_details()]
 
-            for attempt in range(self.retries):  # Retry loop for robustness
-                try:
-                    # Navigate to the listing page and wait until DOM is loaded
-                    await page.goto(self.url, wait_until="domcontentloaded")
-                    await page.wait_for_selector('.list-item-car', timeout=3000000)
-
-                    # Get all car card elements
-                    car_cards = await page.query_selector_all('.list-item-car')
-
-                    for card in car_cards:
-                        # Extract basic metadata
-                        link = await self.scrape_link(card)
-                        brand = await self.scrape_brand(card)
-                        price = await self.scrape_price(card)
-                        title = await self.scrape_title(card)
-                        details = await self.scrape_more_details(link)  # Scrape detail page
-
-                        # Merge all data into one dictionary
-                        cars.append({
-                            'brand': brand,
-                            'price': price,
-                            'link': link,
-                            'title': title,
-                            **details
-                        })
-
-                    break  # Exit retry loop on success
-
-                except Exception as e:
-                    # Log error and retry if needed
-                    print(f"Attempt {attempt + 1} failed for {self.url}: {e}")
-                    if attempt + 1 == self.retries:
-                        print(f"Max retries reached for {self.url}. Returning partial results.")
-                        break
-                finally:
-                    await page.close()
-                    if attempt + 1 < self.retries:
-                        page = await browser.new_page()  # Start new page for next attempt
-
-            await browser.close()
-            return cars  # Return the list of cars collected
-
-    async def scrape_brand(self, card):
-        # Extract car brand text from the card
-        element = await card.query_selector('.brand-car span')
-        return await element.inner_text() if element else None
-
-    async def scrape_price(self, card):
-        # Extract car price text from the card
-        element = await card.query_selector('.price span')
-        return await element.inner_text() if element else None
-
-    async def scrape_link(self, card):
-        # Extract the relative link and build full URL
-        element = await card.query_selector('a')
-        href = await element.get_attribute('href') if element else None
-        return f"https://oogoocar.com{href}" if href else None
-
-    async def scrape_title(self, card):
+    async def iter_car_details(self):
         """
-        Extract model and distance info shown in the title section of the card.
-        Returns a dictionary with model and distance strings.
+        Scrapes the car listings of the provided URL, extracting metadata and scraping each car's
+        detail page, and yields every car in completion order as soon as its details are in.
         """
-        try:
-            title_element = await card.query_selector('.title-car')
-            if not title_element:
-                return {"model": None, "distance": None}
-
-            # Extract model and distance span elements
-            model = await title_element.query_selector('span:nth-child(1)')
-            distance = await title_element.query_selector('span:nth-child(2)')
-
-            # Return texts with fallbacks
-            model_text = await model.inner_text() if model else "Model not found"
-            distance_text = await distance.inner_text() if distance else "Distance not found"
-
-            return {
-                "model": model_text,
-                "distance": distance_text
-            }
-
-        except Exception as e:
-            # Log and return error fallback
-            print(f"Error scraping title: {e}")
-            return {"model": "Error", "distance": "Error"}
+        self._now = datetime.now()
+        # The pooled browser of this scraper's persistent profile is only borrowed, by _get_context, once
+        # a page needs a tab; a listing read entirely over HTTP never launches Chromium
+        self._context = None
+        async with AsyncExitStack() as self._stack:
+            page = None  # Listing tab, opened only when the cards cannot be read over HTTP
+
+            self._http = new_http_client()  # One connection pool for every detail page of the run
+            tasks = []  # Detail scrapes still running are cancelled if the caller stops early
+
+            async def load_listing():
+                # Navigate to the listing page, returning once the response arrives, then wait for the cards
+                await goto(page, self.url, wait_until="commit")
+                await page.locator(CARD_SELECTORS['card']).first.wait_for(timeout=30000)
+
+            try:
+                # The listing is server-rendered, so it is read over plain HTTP; the browser is the fallback
+                cards_meta = await self.fetch_cards()
+                if not cards_meta:
+                    page = await (await self._get_context()).new_page()
+                    # Cap waits at 30s so a broken selector fails fast instead of stalling the run
+                    page.set_default_navigation_timeout(30000)
+                    page.set_default_timeout(30000)
+
+                    # Only the navigation is retried, with backoff, instead of restarting the whole scrape
+                    await with_retry(load_listing, tries=self.retries, timeout=60)
+
+                    # Read every card's fields in one evaluate call instead of several per card
+                    cards_meta = await page.evaluate(CARDS_JS, CARD_SELECTORS)
+                    for meta in cards_meta:
+                        meta['link'] = urljoin(SITE_URL, meta['link']) if meta['link'] else None
+
+                # Skip cars already scraped, e.g. listed again on the next page after new ads shifted it
+                # or twice on this page; each link is marked as seen as soon as its card is kept
+                new_cards = []
+                for meta in cards_meta:
+                    if meta['link'] not in self.seen_links:
+                        self.seen_links.add(meta['link'])
+                        new_cards.append(meta)
+                cards_meta = new_cards
+
+                async def with_details(meta):
+                    try:
+                        details = await self.scrape_more_details(meta['link'])
+                    except Exception as e:
+                        print(f"Error while scraping details from {meta['link']}: {e}")
+                        details = {}
+                    return {**meta, **details}
+
+                # Detail pages are independent, so scrape them concurrently (bounded by self._sem)
+                # and hand each car over as soon as it is done, so the caller never waits for the slowest
+                tasks = [asyncio.ensure_future(with_details(meta)) for meta in cards_meta]
+                for task in asyncio.as_completed(tasks):
+                    yield await task
+
+            except Exception as e:
+                print(f"Failed to scrape {self.url}: {e}")
+            finally:
+                for task in tasks:
+                    task.cancel()  # No-op for the finished ones
+                await self._http.aclose()
+                if page is not None:
+                    await page.close()  # The browser stays open in the pool for the next listing page
 
     async def scrape_more_details(self, url):
         """
         Opens the detail page for a car and extracts:
         submitter info, specifications, description, phone number, ad ID, and publish date.
         """
-        try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-
-                await page.goto(url, wait_until="domcontentloaded")
-
-                # Extract all detailed info
-                submitter = await self.scrape_submitter(page)
-                specification = await self.scrape_specification(page)
-                description = await self.scrape_description(page)
-                phone_number = await self.scrape_phone_number(page)
-                ad_id = await self.scrape_id(page)
-                relative_date = await self.scrape_relative_date(page)
+        # A page scraped by a recent run is not fetched again
+        cached = DETAIL_CACHE.get(url)
+        if cached is not None:
+            return cached
+
+        async with self._sem:  # Limit how many detail pages are open at once
+            try:
+                fields = await asyncio.wait_for(self.read_fields(url), timeout=DETAIL_DEADLINE)
+
+                properties = fields['contact_properties']
+                contact_properties = orjson.loads(properties) if properties else {}
+                relative_date = fields['relative_date']
                 date_published = self.get_publish_date_arabic(relative_date)
 
-                await browser.close()
-
-                return {
-                    'submitter': submitter,
-                    'specification': specification,
-                    'description': description,
-                    'phone_number': phone_number,
-                    'ad_id': ad_id,
+                details = {
+                    'submitter': fields['submitter'],
+                    'specification': fields['specification'],
+                    'description': fields['description'],
+                    'phone_number': contact_properties.get('mobile'),
+                    'ad_id': contact_properties.get('AdId'),
                     'relative_date': relative_date,
                     'date_published': date_published,
                 }
+                # A page whose render timed out still yields a dict of Nones; only a complete read is cached
+                if date_published is not None and fields['specification']:
+                    DETAIL_CACHE.set(url, details)
+                return details
+
+            except Exception as e:
+                # On failure, log and return empty dict
+                print(f"Error while scraping details from {url}: {e}")
+                return {}
 
+    async def fetch_cards(self):
+        """
+        Fetches the listing page over plain HTTP and reads its cards in the shape CARDS_JS returns.
+        Returns [] when the fetch fails or no cards are found.
+        """
+        try:
+            html = await with_retry(lambda: fetch_html(self._http, self.url), tries=self.retries)
+        except Exception as e:
+            print(f"HTTP fetch of {self.url} failed, falling back to the browser: {e}")
+            return []
+
+        cards = []
+        for card in HTMLParser(html).css(CARD_SELECTORS['card']):
+            link = card.css_first(CARD_SELECTORS['link'])
+            href = link.attributes.get('href') if link else None
+            title = card.css_first(CARD_SELECTORS['title'])
+            if title:
+                model = title.css_first('span:nth-child(1)')
+                distance = title.css_first('span:nth-child(2)')
+                title = {
+                    'model': model.text(strip=True) if model else 'Model not found',
+                    'distance': distance.text(strip=True) if distance else 'Distance not found',
+                }
+            else:
+                title = {'model': None, 'distance': None}
+            cards.append({
+                'brand': _text(card.css_first(CARD_SELECTORS['brand'])),
+                'price': _text(card.css_first(CARD_SELECTORS['price'])),
+                'link': urljoin(SITE_URL, href) if href else None,
+                'title': title,
+            })
+        return cards
+
+    async def read_fields(self, url):
+        """
+        Reads the raw detail fields of one page, in the shape DETAILS_JS returns.
+        """
+        # Detail pages are server-rendered, so plain HTTP is tried first; the browser is the fallback.
+        # Once a page has proven to need JavaScript, the rest skip the HTTP attempt.
+        fields = await self.fetch_details(url) if self._static_details is not False else None
+        if fields is None:
+            fields = await self.load_details(url)
+        return fields
+
+    async def fetch_details(self, url):
+        """
+        Fetches the detail page over plain HTTP and reads the same fields DETAILS_JS returns.
+        Returns None when the fetch fails or the page only renders with JavaScript.
+        """
+        try:
+            tree = HTMLParser(await with_retry(lambda: fetch_html(self._http, url)))
         except Exception as e:
-            # On failure, log and return empty dict
-            print(f"Error while scraping details from {url}: {e}")
-            return {}
-
-    async def scrape_submitter(self, page):
-        # Extract submitter name and date posted from detail page
-        element = await page.query_selector('.car-ad-posted figcaption')
-        if not element:
+            if isinstance(e, HTTPStatusError) and not e.transient:
+                raise  # A missing ad is missing in the browser too
+            print(f"HTTP fetch of {url} failed, falling back to the browser: {e}")
             return None
-
-        label = await element.query_selector('label')  # Submitter name
-        relative_date = await element.query_selector('p')  # Posted time
-
+        if tree.css_first(DETAIL_READY_SELECTOR) is None:
+            if self._static_details is None:
+                self._static_details = False  # Rendered by JavaScript; a single odd page after a hit is not
+            return None
+        self._static_details = True
+
+        posted = tree.css_first('.car-ad-posted figcaption')
+        specification = {}
+        for li in tree.css('.specification ul li'):
+            key, value = li.css_first('h3'), li.css_first('p')
+            if key and value:
+                specification[key.text(strip=True)] = value.text(strip=True)
+        description = tree.css_first('#description-section')
+        contact = tree.css_first('.detail-contact-info .whatsapp')
         return {
-            'submitter': await label.inner_text() if label else None,
-            'relative_date': await relative_date.inner_text() if relative_date else None
+            'submitter': {
+                'submitter': _text(posted.css_first('label')),
+                'relative_date': _text(posted.css_first('p')),
+            } if posted else None,
+            'specification': specification,
+            'description': description.text() if description else 'No Description Found',
+            'contact_properties': contact.attributes.get('mpt-properties') if contact else None,
+            'relative_date': _text(posted.css_first('p')) if posted else None,
         }
 
-    async def scrape_specification(self, page):
-        # Extract car specifications as key-value pairs
-        elements = await page.query_selector_all('.specification ul li')
-
-        specifications = {}
-        for element in elements:
-            x = await element.query_selector('h3')  # Spec key
-            y = await element.query_selector('p')   # Spec value
-            if x and y:
-                specifications[await x.inner_text()] = await y.inner_text()
-
-        return specifications
+    async def _get_context(self):
+        """
+        Borrows the pooled browser of this scraper's profile on first use and returns its context;
+        it is released when iter_car_details finishes.
+        """
+        async with self._context_lock:
+            if self._context is None:
+                self._context = await self._stack.enter_async_context(BROWSER_POOL.acquire("certified"))
+        return self._context
 
-    async def scrape_description(self, page):
+    async def load_details(self, url):
         """
-        Scrape the full description of the car from the detail page.
-        Handles any error by returning an error message.
+        Opens the detail page in a browser tab and reads its fields with DETAILS_JS.
         """
+        page = await (await self._get_context()).new_page()  # Only a tab is opened; the browser is shared
         try:
-            selector = '#description-section'  # The <pre> tag with the description
-            await page.wait_for_selector(selector, timeout=15000)
-            element = await page.query_selector(selector)
-            description = await element.inner_text() if element else "No Description Found"
-            return description
-        except Exception as e:
-            print(f"Error scraping description: {e}")
-            return "Error in extracting description"
-
-    async def scrape_phone_number(self, page):
-        # Extract phone number from custom attribute inside .whatsapp button
-        element = await page.query_selector('.detail-contact-info .whatsapp')
-        if element:
-            properties = await element.get_attribute('mpt-properties')
-            data = json.loads(properties)
-            return data.get('mobile')
-        return None
-
-    async def scrape_id(self, page):
-        # Extract ad ID from the same custom JSON attribute
-        element = await page.query_selector('.detail-contact-info .whatsapp')
-        if element:
-            properties = await element.get_attribute('mpt-properties')
-            data = json.loads(properties)
-            return data.get('AdId')
-        return None
-
-    async def scrape_relative_date(self, page):
-        # Extract the relative published time (e.g., "نُشر منذ يوم")
-        element = await page.query_selector('.car-ad-posted figcaption p')
-        return await element.inner_text() if element else None
+            await with_retry(lambda: goto(page, url, wait_until="commit"))
+
+            # Proceed as soon as any key section exists; the wait also covers parsing the document, since
+            # goto returns at commit. If none shows up, give the network a last chance.
+            try:
+                await page.wait_for_selector(DETAIL_READY_SELECTOR, timeout=15000)
+            except PlaywrightTimeoutError:
+                try:
+                    await page.wait_for_load_state('networkidle', timeout=5000)
+                except PlaywrightTimeoutError:
+                    pass
+
+            # Read every field in one evaluate call instead of one round-trip per element
+            return await page.evaluate(DETAILS_JS)
+        finally:
+            await page.close()
 
     def get_publish_date_arabic(self, relative_date):
         """
         Converts relative Arabic time phrases into a full datetime string (e.g., "2 days ago" → 2024-07-15 13:00:00).
         """
-        current_time = datetime.now()
-
-        # Arabic regex patterns for relative times
-        hour_pattern = r'نُشر منذ (\d+) ساعة'
-        day_pattern = r'نُشر منذ (\d+) يوم'
-        one_day_pattern = r'نُشر منذ يوم'
-        two_days_pattern = r'نُشر منذ يومين'
-        three_days_pattern = r'نُشر منذ (\d+) أيام'
-
-        # Check if published hours ago
-        match_hour = re.search(hour_pattern, relative_date)
-        if match_hour:
-            hours_ago = int(match_hour.group(1))
-            publish_time = current_time - timedelta(hours=hours_ago)
-            return publish_time.strftime("%Y-%m-%d %H:%M:%S")
-
-        # One day ago
-        if re.search(one_day_pattern, relative_date):
-            publish_time = current_time - timedelta(days=1)
-            return publish_time.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Two days ago
-        if re.search(two_days_pattern, relative_date):
-            publish_time = current_time - timedelta(days=2)
-            return publish_time.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Three or more days ago (matched using number)
-        match_three_days = re.search(three_days_pattern, relative_date)
-        if match_three_days:
-            days_ago = int(match_three_days.group(1))
-            publish_time = current_time - timedelta(days=days_ago)
-            return publish_time.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Default fallback: assume 3 days ago
-        publish_time = current_time - timedelta(days=3)
-        return publish_time.strftime("%Y-%m-%d %H:%M:%S")
+        if not relative_date:
+            return None  # No posted date on the page
+
+        match = RELATIVE_DATE_PATTERN.search(relative_date)
+        if match is None:
+            delta = timedelta(days=3)  # Default fallback: assume 3 days ago
+        elif match['hours']:
+            delta = timedelta(hours=int(match['hours']))
+        elif match['one_hour']:
+            delta = timedelta(hours=1)
+        elif match['two_hours']:
+            delta = timedelta(hours=2)
+        elif match['one_day']:
+            delta = timedelta(days=1)
+        elif match['two_days']:
+            delta = timedelta(days=2)
+        else:
+            delta = timedelta(days=int(match['days']))
+
+        # isoformat gives the same "YYYY-MM-DD HH:MM:SS" text as strftime, without parsing a format string
+        return ((self._now or datetime.now()) - delta).isoformat(sep=' ', timespec='seconds')
@@ -1,108 +1,189 @@
 import asyncio
+from concurrent.futures import ProcessPoolExecutor  # For sharding showrooms across processes
+from contextlib import asynccontextmanager  # For the context pool's acquire helper
+import multiprocessing  # For the spawn start method of the worker processes
 from playwright.async_api import async_playwright  # For controlling browser interaction
-from SavingOnDrive import SavingOnDrive  # Custom class to handle Google Drive operations
-from bs4 import BeautifulSoup  # For parsing HTML content
-import nest_asyncio  # To allow nested event loops (needed in some environments)
-import json  # For handling JSON operations
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError  # Raised when a wait gives up
+from browser_utils import (  # Shared Chromium, HTTP, navigation and retry helpers
+    PER_HOST_CONCURRENCY, REQUESTS_PER_SECOND, fetch_html, goto, launch_browser, new_context, new_http_client,
+    set_host_concurrency, set_request_rate, with_retry,
+)
+from SavingOnDrive import get_drive_saver  # Process-wide authenticated Google Drive client
+from selectolax.parser import HTMLParser  # Fast C-based HTML parsing
+import orjson  # Fast JSON encoding/decoding
 import logging  # For logging messages
-import pandas as pd  # For Excel export
+import logging.handlers  # QueueHandler/QueueListener for non-blocking logging
+import queue  # Hands log records to the listener thread
+import atexit  # Flushes queued log records when the process exits
+import xlsxwriter  # For streaming the Excel export
 from datetime import datetime  # For timestamping files and folders
 import os  # For file system operations
-
-# Configure logging level to INFO
-logging.basicConfig(level=logging.INFO)
-
-# Apply nest_asyncio for compatibility in nested async environments (e.g., Jupyter)
-nest_asyncio.apply()
+import shutil  # For joining the per-shard JSONL files
+import io  # In-memory Excel workbook for the upload
+from urllib.parse import urljoin  # Resolves relative and absolute hrefs alike
+
+# Base for resolving the site's relative links
+SITE_URL = "https://oogoocar.com"
+
+# Column order of the showrooms Excel sheet; the cars themselves live in the JSONL file named by cars_file
+SHOWROOM_COLUMNS = ['brand', 'title', 'link', 'location', 'time_list', 'phone_number', 'cars_count', 'cars_file']
+
+# Maximum number of car pages scraped at the same time
+MAX_CONCURRENT_CARS = 8
+
+# Maximum number of showroom pages fetched at the same time by count_showroom_cars
+MAX_CONCURRENT_COUNTS = 8
+
+# Pages a pooled context serves before it is replaced by a fresh one, so cookies, storage
+# and renderer memory from earlier pages do not pile up over a long run
+CONTEXT_MAX_PAGES = 25
+
+# Maximum number of showrooms scraped at the same time within one process
+MAX_CONCURRENT_SHOWROOMS = 3
+
+# Worker processes the showrooms are sharded across, each with its own browser and event loop
+SHOWROOM_PROCESSES = min(4, os.cpu_count() or 1)
+
+# Car links inside a showroom page
+CAR_LINK_SELECTOR = '.list-content .list-item-car a'
+
+# Reads brand, title and link of every showroom card in a single browser round-trip
+SHOWROOM_CARDS_JS = """() => Array.from(document.querySelectorAll('.list-item-car.item-logo')).map(c => ({
+    brand: c.querySelector('.brand-car span')?.innerText ?? null,
+    title: c.querySelector('.title-car span')?.innerText ?? null,
+    href: c.querySelector('a')?.getAttribute('href') ?? null,
+}))"""
+
+# Reads the (key, value) rows of the active tab in a single round-trip, including the
+# lookup of the tab body; rows with an icon instead of a label are numbered. Pairs keep
+# the on-page order in Python.
+TAB_ITEMS_JS = """() => {
+    const el = document.querySelector('.tabbing-body .tabbing-content');
+    const rows = [];
+    let counter = 1;
+    for (const li of el ? el.querySelectorAll('li') : []) {
+        const p = li.querySelector('p'), i = li.querySelector('i'), span = li.querySelector('span');
+        if (p && span) rows.push([p.textContent.trim(), span.textContent.trim()]);
+        else if (i && span) rows.push([String(counter++), span.textContent.trim()]);
+    }
+    return rows;
+}"""
+
+# Reads a showroom page's location, working hours and raw phone attribute in a single round-trip
+SHOWROOM_DETAILS_JS = """() => {
+    const timeList = document.querySelector('.time-list');
+    const location = document.querySelector('.inner-map iframe');
+    const phone = document.querySelector('.detail-contact-info[class~="max-md:hidden"] a.call');
+    return {
+        location: location ? location.getAttribute('src') : 'No location found',
+        time_list: timeList ? Array.from(timeList.querySelectorAll('ul li'), li => li.innerText).join(', ') : 'No times found',
+        phone_properties: phone ? phone.getAttribute('mpt-properties') : null,
+        has_phone: phone !== null,
+    };
+}"""
+
+# Snapshot of the tab body, taken before a click so the switch to the new tab can be detected
+TAB_BODY_JS = "() => document.querySelector('.tabbing-body .tabbing-content')?.innerHTML ?? null"
+
+# True once the tab body holds rows and differs from the snapshot taken before the click;
+# with a null snapshot, as passed for the already active first tab, rows alone are enough
+TAB_SWITCHED_JS = """prev => {
+    const el = document.querySelector('.tabbing-body .tabbing-content');
+    return !!el && el.querySelector('li') !== null && el.innerHTML !== prev;
+}"""
+
+
+def configure_logging():
+    # Route log records through a queue so the event loop never blocks on console I/O;
+    # a background listener thread does the actual writing
+    log_queue = queue.SimpleQueue()
+    logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def _estimate_sizes(showrooms):
+    # Expected cars per showroom link from the car links counted before scheduling; showrooms
+    # that could not be counted over HTTP are assumed to be of median size
+    known = sorted(len(showroom['car_links']) for showroom in showrooms if 'car_links' in showroom)
+    default = known[len(known) // 2] if known else 0
+    return {showroom['link']: len(showroom.get('car_links', ())) or default for showroom in showrooms}
+
+
+async def _bounded(sem, fn, *args):
+    # Run fn(*args) while holding a slot of the given semaphore
+    async with sem:
+        return await fn(*args)
 
 class OogooNewCarScraper:
-    def __init__(self, url):
-        # Initialize with a single car URL
+    def __init__(self, url, context):
+        # Initialize with a single car URL and the pooled context to open it in
         self.url = url
+        self.context = context
         self.tab_data = {}
 
     async def scrape_data(self):
         # Main function to scrape details for one car
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            
-            try:
-                await page.goto(self.url)  # Navigate to car page
-                await page.wait_for_selector('div.detail-title-left')  # Wait for key section
-                soup = BeautifulSoup(await page.content(), 'html.parser')  # Parse with BeautifulSoup
-
-                # Compile the full result into one dictionary
-                result = {
-                    'title': await self.extract_title(soup),
-                    'distance': await self.extract_distance(soup),
-                    'case': await self.extract_case(soup),
-                    'submitter': await self.extract_submitter(soup),
-                    'relative_date': await self.extract_relative_date(soup),
-                    'specifications': await self.extract_specifications(soup),
-                    'tabbed_data': await self.extract_tabbed_data(page),
-                }
-
-                return json.dumps(result, ensure_ascii=False, indent=2)
-            finally:
-                await browser.close()
-
-    async def extract_title(self, soup):
-        # Extract the car title
-        title_div = soup.find('div', class_='detail-title-left')
-        if title_div and title_div.find('h1'):
-            return title_div.find('h1').text.strip()
-        return None
-
-    async def extract_distance(self, soup):
-        # Extract the car's distance info
-        info_div = soup.find('div', class_='detail-title-left')
-        if info_div:
-            items = info_div.find_all('li')
-            if len(items) >= 1:
-                return items[0].text.strip()
-        return None
-
-    async def extract_case(self, soup):
-        # Extract case (new/used)
-        info_div = soup.find('div', class_='detail-title-left')
-        if info_div:
-            items = info_div.find_all('li')
-            if len(items) >= 2:
-                return items[1].text.strip()
-        return None
-
-    async def extract_submitter(self, soup):
+        page = await self.context.new_page()
+
+        async def load_page():
+            await goto(page, self.url, wait_until="commit")  # Navigate to car page, return once the response arrives
+            await page.wait_for_selector('div.detail-title-left', timeout=30000)  # Wait only for the key section
+
+        try:
+            await with_retry(load_page, timeout=45)
+            tree = HTMLParser(await page.content())  # Parse with selectolax
+
+            # Look up each page section once and hand it to the extractors that read it
+            title_div = tree.css_first('div.detail-title-left')
+            posted_div = tree.css_first('div.car-ad-posted')
+            spec_div = tree.css_first('div.specification')
+            title, distance, case = self._extract_from_title(title_div)
+
+            # Compile the full result into one dictionary
+            result = {
+                'title': title,
+                'distance': distance,
+                'case': case,
+                'submitter': await self.extract_submitter(posted_div),
+                'relative_date': await self.extract_relative_date(posted_div),
+                'specifications': await self.extract_specifications(spec_div),
+                'tabbed_data': await self.extract_tabbed_data(page),
+            }
+
+            return orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2).decode()
+        finally:
+            await page.close()
+
+    def _extract_from_title(self, title_div):
+        # Extract title, distance and case (new/used) from the title section
+        if title_div is None:
+            return None, None, None
+        heading = title_div.css_first('h1')
+        items = title_div.css('li')
+        title = heading.text().strip() if heading else None
+        distance = items[0].text().strip() if len(items) >= 1 else None
+        case = items[1].text().strip() if len(items) >= 2 else None
+        return title, distance, case
+
+    async def extract_submitter(self, posted_div):
         # Extract the submitter name
-        submitter_div = soup.find('div', class_='car-ad-posted')
-        if submitter_div:
-            return submitter_div.find('label').text.strip()
-        return None
+        label = posted_div.css_first('label') if posted_div else None
+        return label.text().strip() if label else None
 
-    async def extract_relative_date(self, soup):
+    async def extract_relative_date(self, posted_div):
         # Extract the relative post date
-        submitter_div = soup.find('div', class_='car-ad-posted')
-        if submitter_div:
-            return submitter_div.find('p').text.strip()
-        return None    
-    
-    async def extract_specifications(self, soup):
+        date = posted_div.css_first('p') if posted_div else None
+        return date.text().strip() if date else None
+
+    async def extract_specifications(self, spec_div):
         # Extract car specifications from spec section
-        specifications = {}
-        spec_div = soup.find('div', class_='specification')
-        if spec_div:
-            items = spec_div.find_all('li')
-            for item in items:
-                figcaption = item.find('figcaption')
-                if figcaption:
-                    h3_tag = figcaption.find('h3')
-                    p_tag = figcaption.find('p')
-                    if h3_tag and p_tag:
-                        key = h3_tag.text.strip()
-                        value = p_tag.text.strip()
-                        specifications[key] = value
-        return specifications
+        if spec_div is None:
+            return {}
+        # One selector pass returns only the figcaptions that hold both a key and a value
+        figcaptions = spec_div.css('li figcaption:has(h3):has(p)')
+        return {fc.css_first('h3').text().strip(): fc.css_first('p').text().strip() for fc in figcaptions}
 
     async def extract_tabbed_data(self, page):
         # Scrape tabbed content sections (e.g., features or options)
@@ -110,57 +191,41 @@ class OogooNewCarScraper:
         try:
             await page.wait_for_selector('.tabbing-ui')  # Wait for tabbed UI
             tabs = await page.query_selector_all('.tab-list .tab button')  # Get all tab buttons
+            # Every tab's name in one round-trip instead of a text_content call per tab
+            tab_names = await page.eval_on_selector_all('.tab-list .tab button', 'els => els.map(e => e.textContent)')
             
-            for index, tab in enumerate(tabs):
+            for index, (tab, tab_name) in enumerate(zip(tabs, tab_names)):
                 try:
                     await tab.wait_for_element_state('visible')
                     await tab.scroll_into_view_if_needed()
-                    await asyncio.sleep(1)
+                    # The first tab is active on load, so its body will not change and only its rows are awaited
+                    previous_body = await page.evaluate(TAB_BODY_JS) if index else None
                     await tab.click()  # Click the tab
-                    await page.wait_for_selector('.tabbing-body .tabbing-content')
-                    await asyncio.sleep(3)  # Allow time for loading
-                    
-                    tab_name = await tab.text_content()
-                    active_tab_content = await page.query_selector('.tabbing-body .tabbing-content')
+                    # Continue as soon as the new tab's rows are rendered instead of sleeping
+                    try:
+                        await page.wait_for_function(TAB_SWITCHED_JS, arg=previous_body, timeout=3000)
+                    except PlaywrightTimeoutError:
+                        pass  # The clicked tab was already the active one, so the body did not change
                     
-                    if active_tab_content:
-                        list_items = await active_tab_content.query_selector_all('li')
-                        tab_dict = {}
-                        counter = 1
-                        
-                        for item in list_items:
-                            p_element = await item.query_selector('p')
-                            i_element = await item.query_selector('i')
-                            span_element = await item.query_selector('span')
-                            
-                            if p_element and span_element:
-                                key = await p_element.text_content()
-                                value = await span_element.text_content()
-                                tab_dict[key.strip()] = value.strip()
-                            elif i_element and span_element:
-                                key = str(counter)
-                                value = await span_element.text_content()
-                                tab_dict[key] = value.strip()
-                                counter += 1
-                        
-                        if tab_dict:
-                            tab_data[tab_name] = tab_dict
+                    tab_dict = dict(await page.evaluate(TAB_ITEMS_JS))  # Empty when the tab body is missing
+                    if tab_dict:
+                        tab_data[tab_name] = tab_dict
 
                 except Exception as e:
-                    logging.error(f"Error processing tab {index + 1}: {str(e)}")
+                    logging.error("Error processing tab %s: %s", index + 1, e)
                     continue
                     
         except Exception as e:
-            logging.error(f"Error in extract_tabbed_data: {str(e)}")
+            logging.error("Error in extract_tabbed_data: %s", e)
         
         try:
             # Return as JSON string if valid
             if isinstance(tab_data, dict):
-                return json.dumps(tab_data, ensure_ascii=False, indent=2)
+                return orjson.dumps(tab_data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2).decode()
             else:
                 return tab_data
         except Exception as e:
-            logging.error(f"Error parsing tabbed data JSON: {str(e)}")
+            logging.error("Error parsing tabbed data JSON: %s", e)
             return {}
 
 
@@ -171,193 +236,444 @@ class DetailsScraping:
         self.url = url
         self.retries = retries
         self.showrooms_data = []
+        self._pw = None  # Playwright driver, started lazily by _get_browser
+        self._browser = None  # Chromium instance shared by every page of the run
+        self._contexts = None  # Queue of reusable browser contexts, filled by _get_browser
+        self._context_uses = {}  # Context -> pages it has served since it was created
+        self._http = None  # httpx client for server-rendered pages, opened by scrape_showrooms
+        self._car_sem = asyncio.BoundedSemaphore(MAX_CONCURRENT_CARS)  # Caps concurrent car pages
+        self._showroom_sem = asyncio.BoundedSemaphore(MAX_CONCURRENT_SHOWROOMS)  # Caps concurrent showrooms
+        self._showroom_details: dict[str, dict] = {}  # Showroom URL -> contact details read by count_showroom_cars
+        self._car_tasks: dict[str, asyncio.Task] = {}  # Car URL -> running scrape, shared by showrooms listing it
+
+    async def _get_browser(self):
+        # Start Playwright and Chromium once and reuse them for every showroom and car page
+        if self._browser is None:
+            self._pw = await async_playwright().start()
+            self._browser = await launch_browser(self._pw)
+            # Pre-create a small pool of contexts; tasks borrow one and only open a page in it
+            self._contexts = asyncio.Queue()
+            for _ in range(MAX_CONCURRENT_CARS):
+                self._contexts.put_nowait(await new_context(self._browser))
+        return self._browser
+
+    @asynccontextmanager
+    async def _acquire_context(self):
+        # Borrow a context from the pool for the duration of one page scrape
+        context = await self._contexts.get()
+        try:
+            yield context
+        finally:
+            uses = self._context_uses.pop(context, 0) + 1
+            if uses >= CONTEXT_MAX_PAGES:
+                context = await self._recycle_context(context)
+            else:
+                self._context_uses[context] = uses
+            self._contexts.put_nowait(context)
+
+    async def _recycle_context(self, context):
+        # Swap a worn context for a fresh one; keep the old one if a new context cannot be created
+        try:
+            fresh = await new_context(self._browser)
+        except Exception as e:
+            logging.warning("Could not create a fresh browser context, reusing the old one: %s", e)
+            return context
+        try:
+            await context.close()
+        except Exception as e:
+            logging.warning("Error closing a recycled browser context: %s", e)
+        return fresh
+
+    async def _close_browser(self):
+        # Shut down the shared browser and the Playwright driver
+        if self._browser is not None:
+            await self._browser.close()  # Also closes the pooled contexts
+            self._browser = None
+            self._contexts = None
+            self._context_uses = {}
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
 
     async def get_car_details(self):
         # Main function to scrape all showrooms and their cars
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-
-            page.set_default_navigation_timeout(3000000)
-            page.set_default_timeout(3000000)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        jsonl_file = f'showrooms_data_{timestamp}.jsonl'
+        try:
+            showrooms = await self.get_showroom_cards()
+            # Longest first: a big showroom started last would otherwise finish alone at the end
+            await self.count_showroom_cars(showrooms)
+            estimates = _estimate_sizes(showrooms)
+            showrooms.sort(key=lambda showroom: estimates[showroom['link']], reverse=True)
+            if SHOWROOM_PROCESSES > 1 and len(showrooms) > 1:
+                await self._close_browser()  # Each worker process launches its own browser
+                self.showrooms_data = await self.scrape_sharded(showrooms, jsonl_file, estimates)
+            else:
+                await self.scrape_showrooms(showrooms, jsonl_file)
+        finally:
+            await self._close_browser()
+
+        if self.showrooms_data:
+            logging.info("Data saved to %s", jsonl_file)
+        else:
+            if os.path.exists(jsonl_file):
+                os.remove(jsonl_file)
+            jsonl_file = None
+        excel = self.save_to_excel(timestamp, jsonl_file)
+        buffers = [excel] if excel else []
+        files = [jsonl_file] if jsonl_file else []
+        if buffers or files:
+            self.upload_to_drive(files, buffers)
+
+    async def count_showroom_cars(self, showrooms):
+        # Read every showroom page over plain HTTP before scheduling, so the biggest showrooms can
+        # start first. Its car links are kept on the showroom and its contact details in
+        # _showroom_details, so the page is not fetched again; showrooms whose page needs a
+        # browser are left to scrape_showroom.
+        sem = asyncio.BoundedSemaphore(MAX_CONCURRENT_COUNTS)
+        async with new_http_client() as client:
+            async def count(showroom):
+                link = showroom['link']
+                try:
+                    # The rate limiter's token is taken before each attempt's deadline, so showrooms
+                    # queued behind the others do not time out
+                    html = await with_retry(lambda: fetch_html(client, link, take_token=False), take_token=True)
+                    details, car_links = self.parse_showroom_page(HTMLParser(html))
+                except Exception as e:
+                    logging.warning("Could not count the cars of %s: %s", link, e)
+                    return
+                if car_links:
+                    showroom['car_links'] = car_links
+                if details is not None:
+                    self._showroom_details[link] = details
+
+            await asyncio.gather(*(_bounded(sem, count, showroom) for showroom in showrooms))
+
+    async def get_showroom_cards(self):
+        # Read brand, title and link of every showroom on the listing page
+        cards = await self.fetch_showroom_cards()
+        if not cards:
+            cards = await self.load_showroom_cards()  # The listing needs JavaScript after all
+
+        showrooms = []
+        for card in cards:
+            showroom_data = {
+                'brand': card['brand'],
+                'title': card['title'],
+                'link': urljoin(SITE_URL, card['href']) if card['href'] else None
+            }
 
-            try:
-                await page.goto(self.url, wait_until="domcontentloaded")
-                await page.wait_for_selector('.list-item-car.item-logo', timeout=3000000)
-
-                car_cards = await page.query_selector_all('.list-item-car.item-logo')
-                
-                for card in car_cards:
-                    showroom_data = {
-                        'brand': await self.scrape_brand(card),
-                        'title': await self.scrape_title(card),
-                        'link': await self.scrape_link(card)
-                    }
-                    
-                    print("\nShowroom Basic Info:")
-                    print(json.dumps(showroom_data, ensure_ascii=False, indent=2))
-
-                    if showroom_data['link']:
-                        details = await self.scrape_more_details(showroom_data['link'])
-                        print("\nShowroom Details:")
-                        print(json.dumps(details, ensure_ascii=False, indent=2))
-
-                        car_links = await self.get_cars_from_showroom(showroom_data['link'])
-                        cars_count = len(car_links)
-                        print(f"\nFound {cars_count} cars in showroom")
-
-                        cars_data = []
-                        for car_link in car_links:
-                            print(f"\nProcessing car: {car_link}")
-                            car_scraper = OogooNewCarScraper(car_link)
-                            car_details = await car_scraper.scrape_data()
-                            cars_data.append({
-                                'link': car_link,
-                                'details': json.loads(car_details)
-                            })
-
-                        showroom_complete_data = {
-                            'brand': showroom_data['brand'],
-                            'title': showroom_data['title'],
-                            'link': showroom_data['link'],
-                            'location': details['location'],
-                            'time_list': details['time_list'],
-                            'phone_number': details['phone_number'],
-                            'cars_count': cars_count,
-                            'cars': cars_data
-                        }
-                        
-                        self.showrooms_data.append(showroom_complete_data)
+            print("\nShowroom Basic Info:")
+            print(orjson.dumps(showroom_data, option=orjson.OPT_INDENT_2).decode())
 
-            except Exception as e:
-                logging.error(f"Error in main scraping process: {e}")
-            finally:
-                await browser.close()
+            if showroom_data['link']:
+                showrooms.append(showroom_data)
+        return showrooms
 
-            excel_file = self.save_to_excel()
-            if excel_file:
-                self.upload_to_drive(excel_file)
+    async def fetch_showroom_cards(self):
+        # Read the showroom cards from the server-rendered listing over plain HTTP; [] when none are found
+        try:
+            async with new_http_client() as client:
+                html = await with_retry(lambda: fetch_html(client, self.url), tries=self.retries)
+        except Exception as e:
+            logging.warning("HTTP fetch of %s failed, falling back to the browser: %s", self.url, e)
+            return []
+
+        cards = []
+        for card in HTMLParser(html).css('.list-item-car.item-logo'):
+            brand = card.css_first('.brand-car span')
+            title = card.css_first('.title-car span')
+            link = card.css_first('a')
+            cards.append({
+                'brand': brand.text(strip=True) if brand else None,
+                'title': title.text(strip=True) if title else None,
+                'href': link.attributes.get('href') if link else None,
+            })
+        return cards
+
+    async def load_showroom_cards(self):
+        # Read the showroom cards from the listing rendered in a browser page
+        browser = await self._get_browser()
+        context = await new_context(browser)
+        page = await context.new_page()
+
+        page.set_default_navigation_timeout(30000)
+        page.set_default_timeout(30000)
+
+        async def load_listing():
+            await goto(page, self.url, wait_until="commit")
+            await page.wait_for_selector('.list-item-car.item-logo', timeout=30000)
 
-    async def scrape_brand(self, card):
-        # Extract brand name from showroom card
-        element = await card.query_selector('.brand-car span')
-        return await element.inner_text() if element else None
+        try:
+            await with_retry(load_listing, tries=self.retries, timeout=60)
 
-    async def scrape_title(self, card):
-        # Extract showroom title
-        element = await card.query_selector('.title-car span')
-        return await element.inner_text() if element else None
+            # Read every showroom card in one evaluate call instead of three per card
+            return await page.evaluate(SHOWROOM_CARDS_JS)
+        except Exception as e:
+            logging.error("Error in main scraping process: %s", e)
+            return []
+        finally:
+            await context.close()
+
+    async def scrape_showrooms(self, showrooms, jsonl_filename):
+        """
+        Scrape the given showrooms with this process's browser. Each showroom is written with
+        its cars to jsonl_filename as soon as it is done; only its scalar fields are kept in
+        showrooms_data, so memory does not grow with the number of cars.
+        """
+        await self._get_browser()
+        self._http = new_http_client()
+        try:
+            with open(jsonl_filename, 'wb') as fp:
+                async def scrape_and_write(showroom_data):
+                    showroom = await self.scrape_showroom(showroom_data)
+                    # A plain write has no await, so lines from concurrent showrooms never interleave
+                    fp.write(orjson.dumps(showroom, option=orjson.OPT_APPEND_NEWLINE))
+                    del showroom['cars']
+                    return showroom
+
+                # Showrooms are independent, so scrape a few at once; the car semaphore still caps car pages
+                results = await asyncio.gather(
+                    *(_bounded(self._showroom_sem, scrape_and_write, showroom_data) for showroom_data in showrooms),
+                    return_exceptions=True,
+                )
+            for showroom_data, result in zip(showrooms, results):
+                # A failing showroom is logged and skipped without aborting the others
+                if isinstance(result, Exception):
+                    logging.error("Error scraping showroom %s: %s", showroom_data['link'], result)
+                    continue
+                self.showrooms_data.append(result)
+        finally:
+            await self._http.aclose()
+        return self.showrooms_data
+
+    async def scrape_sharded(self, showrooms, jsonl_filename, estimates):
+        # Split the showrooms, sorted biggest first, into shards of similar estimated work, scrape
+        # each one in its own process into its own part file, then join the parts into jsonl_filename
+        processes = min(SHOWROOM_PROCESSES, len(showrooms))
+        shards = [[] for _ in range(processes)]
+        loads = [0] * processes
+        for showroom in showrooms:
+            # Each showroom goes to the shard with the least work so far; +1 counts its own page
+            index = loads.index(min(loads))
+            shards[index].append(showroom)
+            loads[index] += estimates[showroom['link']] + 1
+        part_files = [f'{jsonl_filename}.part{index}' for index in range(len(shards))]
+        # Contact details read while counting travel with their shard, so workers do not fetch them again
+        shard_details = [
+            {showroom['link']: self._showroom_details[showroom['link']]
+             for showroom in shard if showroom['link'] in self._showroom_details}
+            for shard in shards
+        ]
+
+        loop = asyncio.get_running_loop()
+        # spawn, not fork: a forked child would inherit this process's running event loop
+        with ProcessPoolExecutor(
+            max_workers=len(shards),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_shard_worker,
+            initargs=(len(shards),),
+        ) as pool:
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, _scrape_showroom_shard, self.url, self.retries, shard, part, details)
+                    for shard, part, details in zip(shards, part_files, shard_details)
+                ),
+                return_exceptions=True,
+            )
+
+        # Parts are joined in shard order
+        showrooms_data = []
+        with open(jsonl_filename, 'wb') as out:
+            for shard, part, result in zip(shards, part_files, results):
+                if isinstance(result, Exception):
+                    logging.error("Error scraping a shard of %s showrooms: %s", len(shard), result)
+                else:
+                    showrooms_data.extend(result)
+                if os.path.exists(part):
+                    with open(part, 'rb') as fp:
+                        shutil.copyfileobj(fp, out)
+                    os.remove(part)
+        return showrooms_data
+
+    async def scrape_showroom(self, showroom_data):
+        # Scrape one showroom: its contact details, then all of its cars
+        link = showroom_data['link']
+
+        details = self._showroom_details.get(link)
+        car_links = showroom_data.get('car_links')
+        if car_links is None:
+            # Not counted before scheduling, so read the server-rendered page once for both
+            fetched_details, car_links = await self.fetch_showroom_page(link)
+            details = details or fetched_details
+
+        # Whatever the server-rendered page lacked is read in browser pages, concurrently
+        if details is None and not car_links:
+            details, car_links = await asyncio.gather(
+                self.scrape_more_details(link),
+                self.get_cars_from_showroom(link),
+            )
+        elif details is None:
+            details = await self.scrape_more_details(link)
+        elif not car_links:
+            car_links = await self.get_cars_from_showroom(link)
+        print("\nShowroom Details:")
+        print(orjson.dumps(details, option=orjson.OPT_INDENT_2).decode())
+
+        cars_count = len(car_links)
+        print(f"\nFound {cars_count} cars in showroom")
+
+        # Scrape the showroom's cars concurrently, bounded by the car semaphore
+        tasks = [
+            asyncio.create_task(_bounded(self._car_sem, self.scrape_car, car_link))
+            for car_link in car_links
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        cars_data = []
+        for car_link, result in zip(car_links, results):
+            if isinstance(result, Exception):
+                logging.error("Error scraping car %s: %s", car_link, result)
+                continue
+            cars_data.append(result)
+
+        return {
+            'brand': showroom_data['brand'],
+            'title': showroom_data['title'],
+            'link': link,
+            'location': details.get('location'),
+            'time_list': details.get('time_list'),
+            'phone_number': details.get('phone_number'),
+            'cars_count': cars_count,
+            'cars': cars_data
+        }
+
+    async def scrape_car(self, car_link):
+        # Scrape one car page of a showroom. Showrooms listing the same car at the same time share
+        # one scrape; finished scrapes are forgotten, so every showroom keeps full rows for its cars
+        # without the run holding their details in memory.
+        task = self._car_tasks.get(car_link)
+        if task is None:
+            task = asyncio.ensure_future(self._scrape_car(car_link))
+            self._car_tasks[car_link] = task
+            task.add_done_callback(lambda _: self._car_tasks.pop(car_link, None))
+        return await task
+
+    async def _scrape_car(self, car_link):
+        # Scrape one car page for scrape_car
+        print(f"\nProcessing car: {car_link}")
+        async with self._acquire_context() as context:
+            car_scraper = OogooNewCarScraper(car_link, context)
+            car_details = await car_scraper.scrape_data()
+        car_data = {
+            'link': car_link,
+            'details': orjson.loads(car_details)
+        }
+        return car_data
+
+    async def fetch_showroom_page(self, url):
+        # Read the contact details and car links of a showroom from a single plain HTTP fetch;
+        # details are None and car links empty when the page lacks them or the fetch fails
+        try:
+            return self.parse_showroom_page(HTMLParser(await with_retry(lambda: fetch_html(self._http, url))))
+        except Exception as e:
+            logging.warning("HTTP fetch of %s failed, falling back to the browser: %s", url, e)
+            return None, []
 
-    async def scrape_link(self, card):
-        # Extract showroom page URL
-        element = await card.query_selector('a')
-        href = await element.get_attribute('href') if element else None
-        return f"https://oogoocar.com{href}" if href else None
+    def parse_showroom_page(self, tree):
+        # Contact details (None when absent) and car links of a fetched showroom page
+        car_links = self._car_links(a.attributes.get('href') for a in tree.css(CAR_LINK_SELECTOR))
+        return self.parse_more_details(tree), car_links
 
     async def get_cars_from_showroom(self, showroom_url):
-        # Scrape car links listed inside a showroom
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            try:
-                await page.goto(showroom_url, wait_until="networkidle")
+        # Scrape car links listed inside a showroom from a browser page, for lists rendered client-side
+        async with self._acquire_context() as context:
+            page = await context.new_page()
+
+            async def load_showroom():
+                await goto(page, showroom_url, wait_until="networkidle")
                 await page.wait_for_selector('.list-content', timeout=30000)
-                
-                car_cards = await page.query_selector_all('.list-content .list-item-car a')
-                car_links = [await car.get_attribute('href') for car in car_cards]
-                return [f"https://oogoocar.com{link}" for link in car_links if link]
+
+            try:
+                await with_retry(load_showroom, timeout=45)
+
+                hrefs = await page.eval_on_selector_all(
+                    CAR_LINK_SELECTOR, "els => els.map(a => a.getAttribute('href'))"
+                )
+                return self._car_links(hrefs)
 
             except Exception as e:
-                logging.error(f"Error getting cars from showroom: {e}")
+                logging.error("Error getting cars from showroom: %s", e)
                 return []
             finally:
-                await browser.close()
+                await page.close()
+
+    @staticmethod
+    def _car_links(hrefs):
+        # Absolute car URLs in page order; a card links to its car from both the image and the name
+        return list(dict.fromkeys(urljoin(SITE_URL, href) for href in hrefs if href))
 
     async def scrape_more_details(self, url):
-        # Scrape contact/location info from showroom page
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
+        # Scrape contact/location info from a showroom page rendered in the browser
+        async with self._acquire_context() as context:
+            page = await context.new_page()
             try:
-                await page.goto(url, wait_until="domcontentloaded")
-                
-                location = await self.scrape_location(page)
-                time_list = await self.scrape_time_list(page)
-                phone_number = await self.scrape_phone_number(page)
-
-                return {
-                    'location': location,
-                    'time_list': time_list,
-                    'phone_number': phone_number
-                }
+                await with_retry(lambda: goto(page, url, wait_until="domcontentloaded"))
+
+                return await self.scrape_page_details(page)
             except Exception as e:
-                logging.error(f"Error scraping details from {url}: {e}")
+                logging.error("Error scraping details from %s: %s", url, e)
                 return {}
             finally:
-                await browser.close()
+                await page.close()
+
+    def parse_more_details(self, tree):
+        # Read location, working hours and phone from fetched HTML; None when none of them is present
+        time_list_element = tree.css_first('.time-list')
+        location_element = tree.css_first('.inner-map iframe')
+        phone_element = tree.css_first('.detail-contact-info[class~="max-md:hidden"] a.call')
+        if not (time_list_element or location_element or phone_element):
+            return None
 
-    async def scrape_time_list(self, page):
-        # Extract working hours from the page
-        try:
-            time_list_element = await page.query_selector('.time-list')
-            if not time_list_element:
-                return "No times found"
+        if time_list_element:
+            time_list = ", ".join(li.text(separator=' ', strip=True) for li in time_list_element.css('ul li'))
+        else:
+            time_list = "No times found"
 
-            times = await time_list_element.query_selector_all('ul li')
-            time_texts = [await time.inner_text() for time in times]
-            return ", ".join(time_texts)
-        except Exception as e:
-            logging.error(f"Error scraping time list: {e}")
-            return "Error"
+        phone_number = "No phone number found"
+        if phone_element:
+            properties = phone_element.attributes.get('mpt-properties')
+            phone_number = orjson.loads(properties).get('mobile') if properties else None
 
-    async def scrape_location(self, page):
-        # Get Google Maps iframe src link (for showroom location)
-        try:
-            location_element = await page.query_selector('.inner-map iframe')
-            if location_element:
-                src = await location_element.get_attribute('src')
-                return src
-            return "No location found"
-        except Exception as e:
-            logging.error(f"Error scraping location: {e}")
-            return "Error"
+        return {
+            'location': location_element.attributes.get('src') if location_element else "No location found",
+            'time_list': time_list,
+            'phone_number': phone_number
+        }
 
-    async def scrape_phone_number(self, page):
-        # Extract phone number from custom attribute
-        try:
-            phone_element = await page.query_selector('.detail-contact-info.max-md\\:hidden a.call')
-            if phone_element:
-                properties = await phone_element.get_attribute('mpt-properties')
-                data = json.loads(properties)
-                return data.get('mobile')
-            return "No phone number found"
-        except Exception as e:
-            logging.error(f"Error scraping phone: {e}")
-            return "Error"
-
-    def save_to_excel(self):
-        # Convert the scraped data to an Excel file
-        if not self.showrooms_data:
-            logging.warning("No data to save to Excel")
-            return None
+    async def scrape_page_details(self, page):
+        # Read location, working hours and the phone attribute in one evaluate call instead of one per field
+        fields = await page.evaluate(SHOWROOM_DETAILS_JS)
 
-        excel_data = []
+        phone_number = "No phone number found"
+        if fields['has_phone']:
+            try:
+                properties = fields['phone_properties']
+                phone_number = orjson.loads(properties).get('mobile') if properties else None
+            except orjson.JSONDecodeError as e:
+                logging.error("Error scraping phone: %s", e)
+                phone_number = "Error"
+
+        return {
+            'location': fields['location'],
+            'time_list': fields['time_list'],
+            'phone_number': phone_number
+        }
+
+    def _excel_rows(self, jsonl_filename):
+        # Yield one flat Excel row of scalar fields per showroom
         for showroom in self.showrooms_data:
-            cars_info = []
-            for car in showroom['cars']:
-                car_info = {
-                    'link': car['link'],
-                    'title': car['details'].get('title'),
-                    'distance': car['details'].get('distance'),
-                    'case': car['details'].get('case'),
-                    'submitter': car['details'].get('submitter'),
-                    'relative_date': car['details'].get('relative_date'),
-                    'specifications': car['details'].get('specifications'),
-                    'tabbed_data': json.dumps(car['details'].get('tabbed_data', {})),
-                }
-                cars_info.append(car_info)
-
-            row_data = {
+            yield {
                 'brand': showroom['brand'],
                 'title': showroom['title'],
                 'link': showroom['link'],
@@ -365,61 +681,109 @@ class DetailsScraping:
                 'time_list': showroom['time_list'],
                 'phone_number': showroom['phone_number'],
                 'cars_count': showroom['cars_count'],
-                'cars': json.dumps(cars_info, ensure_ascii=False)
+                'cars_file': jsonl_filename,
             }
-            excel_data.append(row_data)
 
-        df = pd.DataFrame(excel_data)
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    def save_to_excel(self, timestamp, jsonl_filename):
+        # Build the Excel file of the scalar showroom fields in memory, ready for upload;
+        # returns (file name, buffer) or None
+        if not self.showrooms_data:
+            logging.warning("No data to save to Excel")
+            return None
+
         excel_filename = f'showrooms_data_{timestamp}.xlsx'
-        
+
         try:
-            with pd.ExcelWriter(excel_filename, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Sheet1')
-                worksheet = writer.sheets['Sheet1']
-                for idx, col in enumerate(df.columns):
-                    worksheet.column_dimensions[chr(65 + idx)].width = 30
-
-            logging.info(f"Data saved to {excel_filename}")
-            return excel_filename
+            # One short row per showroom, so the workbook fits in memory and never touches the disk
+            buffer = io.BytesIO()
+            workbook = xlsxwriter.Workbook(buffer, {
+                'in_memory': True,
+                'strings_to_formulas': False,
+                'strings_to_urls': False,
+            })
+            worksheet = workbook.add_worksheet('Sheet1')
+            worksheet.set_column(0, len(SHOWROOM_COLUMNS) - 1, 30)  # One <col> range for every column
+
+            worksheet.write_row(0, 0, SHOWROOM_COLUMNS)
+            for row_index, row in enumerate(self._excel_rows(jsonl_filename), start=1):
+                worksheet.write_row(row_index, 0, [row[column] for column in SHOWROOM_COLUMNS])
+            workbook.close()
+            buffer.seek(0)
+
+            logging.info("Built %s in memory", excel_filename)
+            return excel_filename, buffer
         except Exception as e:
-            logging.error(f"Error saving to Excel: {e}")
+            logging.error("Error saving to Excel: %s", e)
             return None
 
-    def upload_to_drive(self, file_path):
-        # Upload the Excel file to Google Drive
+    def upload_to_drive(self, file_paths, buffers=()):
+        # Upload the exported files, and the (file name, buffer) pairs built in memory, to Google Drive
+        uploaded = set()  # Names of the buffers already on Drive
         try:
             credentials_json = os.environ.get('SHOWROOMS_GCLOUD_KEY_JSON')
             if not credentials_json:
                 raise EnvironmentError("SHOWROOMS_GCLOUD_KEY_JSON environment variable not found")
-            
-            credentials_dict = json.loads(credentials_json)
 
-            drive_saver = SavingOnDrive(credentials_dict)
-            drive_saver.authenticate()
+            drive_saver = get_drive_saver(credentials_json)
 
             parent_folder_id = '1JcptJHpT8aZoWZRkQw2hyuweKnL40vJV'
-            today_folder = drive_saver.create_folder(datetime.now().strftime('%Y-%m-%d'), parent_folder_id)
-            
-            file_id = drive_saver.upload_file(file_path, today_folder)
-            logging.info(f"File uploaded to Google Drive with ID: {file_id}")
+            today_folder = drive_saver.get_folder(datetime.now().strftime('%Y-%m-%d'), parent_folder_id)
+
+            for file_name, buffer in buffers:
+                file_id = drive_saver.upload_buffer(buffer, file_name, today_folder)
+                uploaded.add(file_name)
+                logging.info("File uploaded to Google Drive with ID: %s", file_id)
             
-            try:
-                os.remove(file_path)
-                logging.info(f"Cleaned up local file: {file_path}")
-            except Exception as e:
-                logging.error(f"Error cleaning up file: {str(e)}")
+            for file_path in file_paths:
+                file_id = drive_saver.upload_file(file_path, today_folder)
+                logging.info("File uploaded to Google Drive with ID: %s", file_id)
+
+                try:
+                    os.remove(file_path)
+                    logging.info("Cleaned up local file: %s", file_path)
+                except Exception as e:
+                    logging.error("Error cleaning up file: %s", e)
 
         except Exception as e:
-            logging.error(f"Error uploading to Google Drive: {str(e)}")
+            logging.error("Error uploading to Google Drive: %s", e)
+            # Keep the in-memory files that did not reach Drive on disk, where the artifact step collects them
+            for file_name, buffer in buffers:
+                if file_name not in uploaded:
+                    with open(file_name, 'wb') as fp:
+                        fp.write(buffer.getvalue())
+                    logging.info("Saved %s locally after the failed upload", file_name)
+
+def _init_shard_worker(processes):
+    configure_logging()  # Spawned workers do not inherit the parent's logging setup
+    # Give each worker process its share of the request budget and of the in-flight cap,
+    # so the site sees the same totals as from a single process
+    set_request_rate(REQUESTS_PER_SECOND / processes)
+    set_host_concurrency(max(1, PER_HOST_CONCURRENCY // processes))
+
+
+async def _run_shard(url, retries, showrooms, jsonl_filename, showroom_details):
+    # Scrape one shard with a fresh scraper, always shutting its browser down
+    scraper = DetailsScraping(url, retries)
+    scraper._showroom_details.update(showroom_details)
+    try:
+        return await scraper.scrape_showrooms(showrooms, jsonl_filename)
+    finally:
+        await scraper._close_browser()
+
+
+def _scrape_showroom_shard(url, retries, showrooms, jsonl_filename, showroom_details):
+    # Worker process entry point: run one shard in its own event loop
+    return asyncio.run(_run_shard(url, retries, showrooms, jsonl_filename, showroom_details))
+
 
 # Entry point of script
 async def main():
+    # In a notebook, which already runs an event loop, await main() directly instead of asyncio.run
     url = "https://oogoocar.com/ar/explore/showrooms"
     scraper = DetailsScraping(url)
     await scraper.get_car_details()
 
 # Run async main
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())